@@ -3,44 +3,132 @@
 # ====================================================
 # gpt-route  &  gpt-bulk  now skip any route whose
 # activities  do **not** overlap  DESIRED_ACTIVITIES.
+#
+# gpt-bulk fans the GPT calls out with asyncio; at most
+# OPENAI_CONCURRENCY (default 32) requests are in flight.
+# gpt-batch sends the same requests through the Batch API
+# (half price, own rate limits, results within 24 h).
+#
+# Answers are cached in «ai_cotation_cache», keyed by a hash of
+# model + prompt + description: identical descriptions reach
+# GPT only once.
 # ====================================================
 
 from __future__ import annotations
-import json, os, re
-from typing import Any, Dict
+import asyncio, hashlib, io, json, os, random, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Tuple
 
+import httpx
 import openai
+import orjson
 import psycopg2.extras             # type: ignore
 from dotenv import load_dotenv
 
 from AI.AiParams          import AiParams
-from Databases.ConnectDB  import ConnectDB
-from Databases.DbParams   import postgresql_config
-from Utils.grade_sort     import sort_cotations
+from Databases.DbOps      import jsonb, writeCotations
+from Databases.DbSql      import PICK_LANG_SQL
+from Databases.Pool       import get_conn
+from Utils.grade_sort     import sort_and_array
+from Utils.json_extract   import extract_json
 from Parameters.activities import DESIRED_ACTIVITIES      # ← NEW
 
+_WANTED: frozenset[str] = frozenset(DESIRED_ACTIVITIES)
 
-# ────────── regex helper ─────────────────────────────────────────────
-_JSON_RE = re.compile(
-    r"""
-    \{
-        [^\{\}]*?"difficulties"\s*:\s*\{[^{}]*\}
-        [^{}]*?"ambiguous"\s*:\s*(?:true|false)
-        [^{}]*?
-    \}
-    """,
-    re.IGNORECASE | re.DOTALL | re.VERBOSE,
-)
 
+# ────────── concurrency / retry settings ─────────────────────────────
+MODEL = "gpt-4o"
+
+_MAX_ATTEMPTS = 5           # 1 call + 4 retries on 429 / 5xx / network
+_BACKOFF_BASE = 1.0         # seconds, doubled after every failed attempt
+_RETRYABLE    = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
 
-def _extract_json(text: str) -> Dict[str, Any] | None:
-    m = _JSON_RE.search(text)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(0))
-    except json.JSONDecodeError:
-        return None
+_HTTP_LIMITS  = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+STREAM_ROWS      = 1_000    # rows per server-side cursor fetch in gpt-bulk
+_BATCH_MAX_LINES = 50_000   # Batch API hard limit per input file
+_BATCH_DONE      = {"completed", "failed", "expired", "cancelled"}
+
+
+# strict structured output: the answer is schema-valid JSON, no scanning
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "cotations",
+        "schema": AiParams.RESPONSE_SCHEMA,
+        "strict": True,
+    },
+}
+
+
+# ────────── answer cache (Databases/migrations/002_ai_cotation_cache.sql)
+_MEMO_SIZE = 4096           # in-process LRU on top of the table
+
+# hashing starts from model + prompts, so editing them invalidates the cache
+_HASH_SEED = hashlib.blake2b(digest_size=16)
+for _part in (
+    MODEL,
+    AiParams.SYSTEM_PROMPT,
+    AiParams.USER_PROMPT_TEMPLATE,
+    json.dumps(AiParams.RESPONSE_SCHEMA, sort_keys=True),
+):
+    _HASH_SEED.update(_part.encode("utf-8") + b"\0")
+
+
+def desc_hash(text: str) -> bytes:
+    """16-byte cache key of a description."""
+    h = _HASH_SEED.copy()
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+def difficulties_of(answer: dict[str, Any]) -> Dict[str, int]:
+    """
+    «difficulties» of a parsed answer as {grade: count}.  Structured
+    output gives [{"grade", "count"}, …]; older answers used a map.
+    Repeated grades are summed.
+    """
+    raw = answer.get("difficulties") or {}
+    if isinstance(raw, dict):
+        return dict(raw)
+    out: Dict[str, int] = {}
+    for item in raw:
+        if isinstance(item, dict) and "grade" in item:
+            out[item["grade"]] = out.get(item["grade"], 0) + item.get("count", 1)
+    return out
+
+
+def gpt_concurrency() -> int:
+    """Max number of in-flight GPT requests (env OPENAI_CONCURRENCY)."""
+    return max(1, int(os.getenv("OPENAI_CONCURRENCY", "32")))
+
+
+_CLIENT: openai.OpenAI | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _sync_client(api_key: str) -> openai.OpenAI:
+    """
+    Process-wide OpenAI client (thread-safe: httpx.Client may be shared
+    by worker threads).  One keep-alive HTTP/2 pool for every AiOps.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = openai.OpenAI(
+                    api_key=api_key,
+                    http_client=httpx.Client(
+                        http2=True, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT
+                    ),
+                )
+    return _CLIENT
 
 
 # ────────── GPT wrapper ──────────────────────────────────────────────
@@ -50,28 +138,128 @@ class AiOps:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY missing")
-        openai.api_key = api_key
+        self._client = _sync_client(api_key)
+        # the async pool stays per instance: its connections belong to
+        # the event loop of the asyncio.run() that uses them.
+        # Retries are handled in ask_gpt_async (exponential back-off)
+        self._aclient = openai.AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                http2=True, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT
+            ),
+        )
+
+    # byte-identical system message on every call, variable text last:
+    # the shared prefix is served from OpenAI's prompt cache
+    _SYSTEM_MSG: Dict[str, str] = {"role": "system", "content": AiParams.SYSTEM_PROMPT}
+    _USER_HEAD, _USER_TAIL = AiParams.USER_PROMPT_TEMPLATE.split("{user_text}")
+
+    @classmethod
+    def _payload(cls, user_text: str) -> dict[str, Any]:
+        """Chat-completion request body shared by sync, async and batch."""
+        return {
+            "model": MODEL,
+            "temperature": 0.0,
+            "seed": 0,
+            "response_format": _RESPONSE_FORMAT,
+            "messages": [
+                cls._SYSTEM_MSG,
+                {"role": "user", "content": cls._USER_HEAD + user_text + cls._USER_TAIL},
+            ],
+        }
 
     def ask_gpt(self, user_text: str) -> str:
         try:
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o",
-                temperature=0.0,
-                messages=[
-                    {"role": "system", "content": AiParams.SYSTEM_PROMPT},
-                    {
-                        "role": "user",
-                        "content": AiParams.USER_PROMPT_TEMPLATE.format(
-                            user_text=user_text
-                        ),
-                    },
-                ],
-            )
-            return resp.choices[0].message.content.strip()
+            resp = self._client.chat.completions.create(**self._payload(user_text))
+            return (resp.choices[0].message.content or "").strip()
         except Exception as exc:
             print(f"[AiOps] error while calling GPT: {exc}")
             return ""
 
+    async def ask_gpt_async(self, user_text: str) -> str:
+        """Async twin of ask_gpt, retrying 429 / 5xx with back-off + jitter."""
+        delay = _BACKOFF_BASE
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                resp = await self._aclient.chat.completions.create(
+                    **self._payload(user_text)
+                )
+                return (resp.choices[0].message.content or "").strip()
+            except _RETRYABLE as exc:
+                if attempt == _MAX_ATTEMPTS:
+                    print(f"[AiOps] giving up after {attempt} attempts: {exc}")
+                    return ""
+                await asyncio.sleep(delay + random.uniform(0, delay))
+                delay *= 2
+            except Exception as exc:
+                print(f"[AiOps] error while calling GPT: {exc}")
+                return ""
+        return ""
+
+    # ------------------------------------------------------------------
+    def submit_batch(self, items: List[Tuple[str, str]]) -> str:
+        """Upload (custom_id, text) pairs as one Batch job, return its id."""
+        buf = io.BytesIO()
+        for custom_id, text in items:
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._payload(text),
+            }
+            buf.write(orjson.dumps(line))
+            buf.write(b"\n")
+
+        upload = self._client.files.create(
+            file=("cotations.jsonl", buf.getvalue()), purpose="batch"
+        )
+        batch = self._client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"[Batch] submitted {batch.id} ({len(items)} requests)")
+        return batch.id
+
+    def collect_batch(
+        self, batch_id: str, poll_every: float = 60.0
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Wait for a Batch job, then yield (custom_id, answer) for every
+        request that succeeded; failed requests are only logged.
+        """
+        batch = self._client.batches.retrieve(batch_id)
+        while batch.status not in _BATCH_DONE:
+            time.sleep(poll_every)
+            batch = self._client.batches.retrieve(batch_id)
+
+        print(f"[Batch] {batch_id} → {batch.status}")
+
+        # requests rejected before reaching the model are only listed here
+        if batch.error_file_id:
+            content = self._client.files.content(batch.error_file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    rec = orjson.loads(line)
+                    print(f"[Batch] {rec.get('custom_id')} failed: {rec.get('error')}")
+
+        # failed / expired / cancelled jobs may have no output at all
+        if not batch.output_file_id:
+            return
+
+        content = self._client.files.content(batch.output_file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            rec  = orjson.loads(line)
+            resp = rec.get("response") or {}
+            if resp.get("status_code") != 200:
+                print(f"[Batch] {rec.get('custom_id')} failed: {rec.get('error')}")
+                continue
+            msg = resp["body"]["choices"][0]["message"]
+            yield rec["custom_id"], (msg.get("content") or "").strip()
+
     # kept for backward compatibility
     generate_response = ask_gpt
 
@@ -82,135 +270,304 @@ class AiOpsCotationsExtended:
 
     def __init__(self) -> None:
         self.gpt = AiOps()
+        self._memo: OrderedDict[bytes, Dict[str, int]] = OrderedDict()
+        self._cache_table: bool | None = None   # None = not checked yet
 
     # ------------------------------------------------------------------
-    @staticmethod
-    def _wanted_activity(acts_json: str | list | None) -> bool:
-        """Return True iff activities overlap the wanted set."""
-        if not acts_json:
-            return False
-        acts = acts_json if isinstance(acts_json, list) else json.loads(acts_json)
-        return any(a in DESIRED_ACTIVITIES for a in acts)
+    def _remember(self, h: bytes, difficulties: Dict[str, int]) -> None:
+        self._memo[h] = difficulties
+        self._memo.move_to_end(h)
+        if len(self._memo) > _MEMO_SIZE:
+            self._memo.popitem(last=False)
+
+    def _has_cache_table(self) -> bool:
+        """Whether migration 002 is applied; checked once, warns if not."""
+        if self._cache_table is None:
+            with get_conn() as conn, conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('ai_cotation_cache') IS NOT NULL")
+                self._cache_table = cur.fetchone()[0]
+            if not self._cache_table:
+                print("[AiOps] WARNING: table ai_cotation_cache missing "
+                      "(Databases/migrations/002) – answer cache disabled")
+        return self._cache_table
+
+    def _cache_get(self, hashes: set[bytes]) -> Dict[bytes, Dict[str, int]]:
+        """Cached answers for `hashes` (memo first, then one SELECT)."""
+        found = {h: self._memo[h] for h in hashes if h in self._memo}
+        missing = [h for h in hashes if h not in found]
+        if missing and self._has_cache_table():
+            with get_conn() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "SELECT desc_hash, result FROM ai_cotation_cache"
+                    " WHERE desc_hash = ANY(%s)",
+                    (missing,),
+                )
+                for h, result in cur.fetchall():
+                    found[bytes(h)] = result
+        for h, result in found.items():
+            self._remember(h, result)
+        return found
+
+    def _cache_put(
+        self, fresh: Dict[bytes, Dict[str, int]], *, persist: bool = True
+    ) -> None:
+        """Remember `fresh` answers; persist=False (dry-run) keeps them in memory."""
+        if not fresh:
+            return
+        if persist and self._has_cache_table():
+            with get_conn() as conn, conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO ai_cotation_cache (desc_hash, result)
+                    VALUES %s
+                    ON CONFLICT (desc_hash) DO NOTHING
+                    """,
+                    [(h, jsonb(r)) for h, r in fresh.items()],
+                )
+        for h, result in fresh.items():
+            self._remember(h, result)
+
+    # ------------------------------------------------------------------
+    def _process_text(
+        self, text: str, rid: int, *, persist: bool = True
+    ) -> Dict[str, int]:
+        h = desc_hash(text)
+        cached = self._cache_get({h})
+        if h in cached:
+            print(f"[Route {rid}] cache hit")
+            return cached[h]
+
+        data = self._parse_raw(self.gpt.ask_gpt(text), rid)
+        if data is None:
+            return {}
+        self._cache_put({h: data}, persist=persist)
+        return data
 
     # ------------------------------------------------------------------
-    def _process_text(self, text: str, rid: int) -> Dict[str, int]:
-        raw = self.gpt.ask_gpt(text)
+    async def _process_route(
+        self, rid: int, text: str, sem: asyncio.Semaphore
+    ) -> Dict[str, int] | None:
+        async with sem:
+            raw = await self.gpt.ask_gpt_async(text)
+        return self._parse_raw(raw, rid)
 
+    # ------------------------------------------------------------------
+    async def _process_many(
+        self, work: List[Tuple[int, str]], *, persist: bool = True
+    ) -> List[Tuple[int, Dict[str, int]]]:
+        """
+        GPT every (route_id, text) pair concurrently; cached and
+        duplicate descriptions are answered without a request.  Routes
+        whose request failed or did not parse are left out, so they keep
+        their current ai_cotations.
+        """
+        hashes = [desc_hash(text) for _, text in work]
+        known  = self._cache_get(set(hashes))
+
+        todo: dict[bytes, tuple[int, str]] = {}
+        for h, (rid, text) in zip(hashes, work):
+            if h not in known and h not in todo:
+                todo[h] = (rid, text)
+
+        sem = asyncio.Semaphore(gpt_concurrency())
+        answers = await asyncio.gather(
+            *(self._process_route(rid, text, sem) for rid, text in todo.values())
+        )
+        fresh = {h: data for h, data in zip(todo, answers) if data is not None}
+        self._cache_put(fresh, persist=persist)
+        known.update(fresh)
+
+        # never overwrite a route with [] because its request failed
+        answered = [(rid, known[h]) for h, (rid, _) in zip(hashes, work) if h in known]
+        missing  = len(work) - len(answered)
+        if missing:
+            print(f"[Bulk] {missing} routes without an answer — left untouched")
+        return answered
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _parse_raw(raw: str, rid: int) -> Dict[str, int] | None:
+        """GPT answer → difficulties dict (None if it is not valid JSON)."""
         print(f"\n── GPT raw • {rid} ───────────────────────────────")
         print(raw or "(empty)")
         print("─────────────────────────────────────────────────\n")
 
-        data = _extract_json(raw)
+        # structured output parses as-is; extract_json only has to scan
+        # answers produced without a schema
+        data = extract_json(raw)
         if data is None:
             print(f"[Route {rid}] JSON block not found → ambiguous")
-            return {}
-        return data.get("difficulties", {})
-
-    # ------------------------------------------------------------------
-    @staticmethod
-    def _pick_lang(desc_blob: str | dict) -> str:
-        if isinstance(desc_blob, dict):
-            d = desc_blob
-        else:
-            try:
-                d = json.loads(desc_blob or "{}")
-            except json.JSONDecodeError:
-                return ""
-        return d.get("fr") or d.get("en") or d.get("it") or ""
+            return None
+        return difficulties_of(data)
 
     # ------------------------------------------------------------------
     def produceCotationsForRoute(self, route_id: int, *, dry_run: bool = False) -> None:
-        """Single-route helper (unchanged except for jsonb array)."""
-        conn = ConnectDB(**postgresql_config).connect()
-        try:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        """Single-route helper; language pick and activity test run in SQL."""
+        with get_conn() as conn:
+            with conn.cursor() as cur:
                 cur.execute(
-                    "SELECT description FROM route WHERE id = %s", (route_id,)
+                    f"""
+                    SELECT {PICK_LANG_SQL}, activities ?| %s::text[]
+                    FROM   route
+                    WHERE  id = %s
+                    """,
+                    (sorted(_WANTED), route_id),
                 )
                 row = cur.fetchone()
             if not row:
                 print(f"[Route {route_id}] not found")
                 return
-
-            desc = self._pick_lang(row["description"])
+            desc, wanted = row
+            if not wanted:
+                print(f"[Route {route_id}] activities not in DESIRED_ACTIVITIES")
+                return
             if not desc.strip():
                 print(f"[Route {route_id}] empty description")
                 return
 
-            cotations = sort_cotations(self._process_text(desc, route_id))
-            cot_list  = [{"grade": g, "count": c} for g, c in cotations.items()]
+            difficulties = self._process_text(desc, route_id, persist=not dry_run)
 
             if dry_run:
-                print(f"[DRY-RUN] {route_id} → {cot_list}")
+                print(f"[DRY-RUN] {route_id} → {sort_and_array(difficulties)}")
                 return
 
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE route SET ai_cotations = %s::jsonb WHERE id = %s",
-                    (json.dumps(cot_list, ensure_ascii=False), route_id),
-                )
+                writeCotations(cur, [(route_id, difficulties)])
                 conn.commit()
             print(f"[Route {route_id}] ai_cotations updated")
-        finally:
-            conn.close()
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _query_work(cur, *, skip: bool, limit: int | None) -> None:
+        """
+        Execute the SELECT of (route_id, description) still to send to
+        GPT.  Every filter (status, activities, skip, empty text) runs in
+        Postgres; see Databases/migrations/001_route_ai_todo_idx.sql.
+        """
+        where = [
+            "status = '1'",
+            "activities ?| %(acts)s::text[]",
+            "btrim(d.txt) <> ''",
+        ]
+        if skip:
+            where.append("(ai_cotations IS NULL OR ai_cotations = '[]'::jsonb)")
+
+        cur.execute(
+            f"""
+            SELECT id, d.txt
+            FROM   route,
+                   LATERAL (SELECT {PICK_LANG_SQL} AS txt) AS d
+            WHERE  {" AND ".join(where)}
+            ORDER  BY id
+            LIMIT  %(limit)s
+            """,
+            {"acts": sorted(_WANTED), "limit": limit},
+        )
 
     # ------------------------------------------------------------------
     def produceCotationsInBulk(
         self, *, skip: bool = True, limit: int | None = None, dry_run: bool = False
     ) -> None:
         """
-        Iterate over live routes, filter by activities, send to GPT.
+        Stream live routes from a server-side cursor, STREAM_ROWS at a
+        time; each slice is sent to GPT concurrently and written back
+        (and committed) before the next one is fetched.
         """
-        conn = ConnectDB(**postgresql_config).connect()
-        try:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute(
-                    """
-                    SELECT id, description, ai_cotations, activities
-                    FROM   route
-                    WHERE  status = '1'
-                    """
-                )
-                rows = cur.fetchall()
-
-            processed = updated = 0
-            for row in rows:
-                if limit is not None and processed >= limit:
-                    break
-                processed += 1
-                rid = row["id"]
-
-                # 1⃣  activity filter  (NEW) -----------------------------
-                if not self._wanted_activity(row["activities"]):
-                    continue
-
-                # 2⃣  optional skip of already-processed routes ----------
-                if skip and row["ai_cotations"] not in (None, [], "[]", ""):
-                    continue
-
-                desc = self._pick_lang(row["description"])
-                if not desc.strip():
-                    continue
-
-                cotations = sort_cotations(self._process_text(desc, rid))
-                cot_list  = [{"grade": g, "count": c} for g, c in cotations.items()]
-
-                if dry_run:
-                    print(f"[DRY-RUN] {rid} → {cot_list}")
-                    continue
-
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "UPDATE route SET ai_cotations = %s::jsonb WHERE id = %s",
-                        (json.dumps(cot_list, ensure_ascii=False), rid),
-                    )
-                    if cur.rowcount:
-                        conn.commit()
-                        updated += 1
-                    else:
-                        conn.rollback()
-
-            if not dry_run:
-                print(f"[Bulk] processed {processed} — updated {updated}")
-        finally:
-            conn.close()
+        processed, updated = asyncio.run(
+            self._bulk(skip=skip, limit=limit, dry_run=dry_run)
+        )
+        if not dry_run:
+            print(f"[Bulk] processed {processed} — updated {updated}")
+
+    async def _bulk(
+        self, *, skip: bool, limit: int | None, dry_run: bool
+    ) -> Tuple[int, int]:
+        processed = updated = 0
+        with get_conn() as conn:
+            # WITH HOLD keeps the cursor open across the per-slice commits
+            with conn.cursor(name="route_stream", withhold=True) as stream:
+                self._query_work(stream, skip=skip, limit=limit)
+
+                while True:
+                    rows = stream.fetchmany(STREAM_ROWS)
+                    if not rows:
+                        break
+                    processed += len(rows)
+
+                    # 1⃣  GPT fan-out (bounded by OPENAI_CONCURRENCY) ----
+                    results = await self._process_many(rows, persist=not dry_run)
+
+                    if dry_run:
+                        for rid, difficulties in results:
+                            print(f"[DRY-RUN] {rid} → {sort_and_array(difficulties)}")
+                        continue
+
+                    # 2⃣  one batched UPDATE (sorted in SQL) + commit -----
+                    with conn.cursor() as cur:
+                        updated += writeCotations(cur, results)
+                    conn.commit()
+        return processed, updated
+
+    # ------------------------------------------------------------------
+    def produceCotationsBatch(
+        self,
+        *,
+        skip: bool = True,
+        limit: int | None = None,
+        dry_run: bool = False,
+        poll_every: float = 60.0,
+    ) -> None:
+        """
+        Same selection as produceCotationsInBulk, but every prompt goes
+        through the OpenAI Batch API and all answered rows are written in
+        one transaction once the job(s) are done.  Routes left without an
+        answer (failed request or job) keep their current ai_cotations.
+        """
+        with get_conn() as conn, conn.cursor() as cur:
+            self._query_work(cur, skip=skip, limit=limit)
+            work = cur.fetchall()
+        if not work:
+            print("[Batch] nothing to send")
+            return
+
+        # cached / duplicate descriptions are not sent again
+        hashes = [desc_hash(desc) for _, desc in work]
+        known  = self._cache_get(set(hashes))
+        todo: dict[bytes, tuple[int, str]] = {}
+        for h, (rid, desc) in zip(hashes, work):
+            if h not in known and h not in todo:
+                todo[h] = (rid, desc)
+        todo_list = list(todo.items())
+
+        # the connection goes back to the pool while the job runs (≤ 24 h)
+        batch_ids = [
+            self.gpt.submit_batch(
+                [(h.hex(), desc) for h, (_, desc) in todo_list[i:i + _BATCH_MAX_LINES]]
+            )
+            for i in range(0, len(todo_list), _BATCH_MAX_LINES)
+        ]
+
+        fresh: dict[bytes, Dict[str, int]] = {}
+        for batch_id in batch_ids:
+            for custom_id, raw in self.gpt.collect_batch(batch_id, poll_every):
+                h    = bytes.fromhex(custom_id)
+                data = self._parse_raw(raw, todo[h][0])
+                if data is not None:
+                    fresh[h] = data
+        self._cache_put(fresh, persist=not dry_run)
+        known.update(fresh)
+
+        # never overwrite a route with [] because its request failed
+        pending = [(rid, known[h]) for h, (rid, _) in zip(hashes, work) if h in known]
+        missing = len(work) - len(pending)
+        if missing:
+            print(f"[Batch] {missing} routes without an answer — left untouched")
+        if dry_run:
+            for rid, difficulties in pending:
+                print(f"[DRY-RUN] {rid} → {sort_and_array(difficulties)}")
+            return
+
+        with get_conn() as conn, conn.cursor() as cur:
+            updated = writeCotations(cur, pending)
+        print(f"[Batch] processed {len(work)} — updated {updated}")
@@ -35,6 +35,31 @@ class AiParams:          # noqa: N801  (keep original camel-case)
     ]
     VALID_SET = _arabic + _roman
 
+    # ------------------------------------------------------------------
+    # 2) structured-output schema (response_format=json_schema, strict).
+    #    Strict mode forbids free-form maps, hence a list of pairs.
+    # ------------------------------------------------------------------
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "difficulties": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "grade": {"type": "string", "enum": VALID_SET},
+                        "count": {"type": "integer"},
+                    },
+                    "required": ["grade", "count"],
+                    "additionalProperties": False,
+                },
+            },
+            "ambiguous": {"type": "boolean"},
+        },
+        "required": ["difficulties", "ambiguous"],
+        "additionalProperties": False,
+    }
+
     # ------------------------------------------------------------------
     SYSTEM_PROMPT = (
         "You are an assistant that extracts *all* climbing grades mentioned in a text.\n"
@@ -59,9 +84,9 @@ class AiParams:          # noqa: N801  (keep original camel-case)
 
         "OUTPUT FORMAT\n"
         "Return **one** valid JSON object – nothing before or after it – with exactly:\n"
-        "  \"difficulties\": { <grade>: <integer>, … }\n"
+        "  \"difficulties\": [ {\"grade\": <grade>, \"count\": <integer>}, … ]\n"
         "  \"ambiguous\"  : true | false\n\n"
-        "The keys inside \"difficulties\" **must follow this canonical order** so downstream graphs\n"
+        "The entries inside \"difficulties\" **must follow this canonical order** so downstream graphs\n"
         "display correctly (Arabic ↔ Roman pairs alternating, then normal progression):\n"
         "  1, I, 2, II, 3, III, 3+, III+, 4, IV-, IV, IV+, 4+, V-, V, V+, 5, 5+, 6, 6a, 6a+, 6b, 6b+, …\n"
         "Skip grades that do not appear, but respect the order of those that do.\n\n"
@@ -70,46 +95,46 @@ class AiParams:          # noqa: N801  (keep original camel-case)
         "-------------------------------------------\n"
         "Example A – simple mix\n"
         "{\n"
-        "  \"difficulties\": {\n"
-        "    \"III\": 1,\n"
-        "    \"3+\": 2,\n"
-        "    \"IV-\": 1,\n"
-        "    \"4a\": 3\n"
-        "  },\n"
+        "  \"difficulties\": [\n"
+        "    {\"grade\": \"III\", \"count\": 1},\n"
+        "    {\"grade\": \"3+\", \"count\": 2},\n"
+        "    {\"grade\": \"IV-\", \"count\": 1},\n"
+        "    {\"grade\": \"4a\", \"count\": 3}\n"
+        "  ],\n"
         "  \"ambiguous\": false\n"
         "}\n\n"
 
         "Example B – explicit counts *and* a broad range\n"
         "{\n"
-        "  \"difficulties\": {\n"
-        "    \"VI-\": 1,\n"
-        "    \"6a\": 4,\n"
-        "    \"VI\": 2,\n"
-        "    \"6b\": 2,\n"
-        "    \"VI+\": 1,\n"
-        "    \"6c\": 1\n"
-        "  },\n"
+        "  \"difficulties\": [\n"
+        "    {\"grade\": \"VI-\", \"count\": 1},\n"
+        "    {\"grade\": \"6a\", \"count\": 4},\n"
+        "    {\"grade\": \"VI\", \"count\": 2},\n"
+        "    {\"grade\": \"6b\", \"count\": 2},\n"
+        "    {\"grade\": \"VI+\", \"count\": 1},\n"
+        "    {\"grade\": \"6c\", \"count\": 1}\n"
+        "  ],\n"
         "  \"ambiguous\": true\n"
         "}\n\n"
 
         "Example C – high-end grades only in Roman\n"
         "{\n"
-        "  \"difficulties\": {\n"
-        "    \"VIII\": 2,\n"
-        "    \"VIII+\": 1,\n"
-        "    \"IX-\": 1\n"
-        "  },\n"
+        "  \"difficulties\": [\n"
+        "    {\"grade\": \"VIII\", \"count\": 2},\n"
+        "    {\"grade\": \"VIII+\", \"count\": 1},\n"
+        "    {\"grade\": \"IX-\", \"count\": 1}\n"
+        "  ],\n"
         "  \"ambiguous\": false\n"
         "}\n\n"
 
         "Example D – mixed low grades with ambiguity\n"
         "{\n"
-        "  \"difficulties\": {\n"
-        "    \"I\": 1,\n"
-        "    \"2\": 1,\n"
-        "    \"II\": 1,\n"
-        "    \"3\": 1\n"
-        "  },\n"
+        "  \"difficulties\": [\n"
+        "    {\"grade\": \"I\", \"count\": 1},\n"
+        "    {\"grade\": \"2\", \"count\": 1},\n"
+        "    {\"grade\": \"II\", \"count\": 1},\n"
+        "    {\"grade\": \"3\", \"count\": 1}\n"
+        "  ],\n"
         "  \"ambiguous\": true\n"
         "}"
     )
@@ -5,23 +5,103 @@
 # ======================================================================
 
 import csv
-import json
 from pathlib import Path
 
+import orjson
+import psycopg2                    # type: ignore
+import psycopg2.extras             # type: ignore
+from psycopg2 import sql           # type: ignore
 from dotenv import load_dotenv
 
-from Databases.ConnectDB import ConnectDB
-from Databases.DbParams  import postgresql_config
-from Utils.grade_sort    import sort_cotations
+from Databases.Pool      import get_conn
+from Utils.grade_sort    import GRADE_ORDER
+
+# rows per UPDATE … FROM (VALUES …) statement
+UPDATE_PAGE_SIZE = 500
+
+
+# ──────────────────────────────────────────────────────────────────────
+def _dumps(obj) -> str:
+    return orjson.dumps(obj).decode()
+
+
+def jsonb(obj) -> psycopg2.extras.Json:
+    """psycopg2 adapter for a jsonb parameter, serialised by orjson."""
+    return psycopg2.extras.Json(obj, dumps=_dumps)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Canonical grade order lives in Postgres as well, so cotations are
+# sorted by the statement that writes them.  A cotation document may be
+# a {grade: count} object (GPT / legacy CSV) or a [{"grade", "count"}]
+# array (reducer output); both come out as an array in the order of
+# Utils.grade_sort.GRADE_ORDER, unknown grades last in code-point order
+# (COLLATE "C"), exactly like Utils.grade_sort.sort_cotations.
+
+# GRADE_ORDER is passed through psycopg2's adapter, never pasted as text
+_GRADE_RANK_CTE = sql.SQL(
+    "grade_rank AS (SELECT lower(g) AS g, ord "
+    "FROM unnest({}::text[]) WITH ORDINALITY AS o(g, ord))"
+).format(sql.Literal(list(GRADE_ORDER)))
+
+
+def _grade_rank_cte(cur) -> str:
+    """The grade_rank CTE as SQL text, quoted for `cur`'s connection."""
+    return _GRADE_RANK_CTE.as_string(cur)
+
+
+def _sorted_sql(doc: str) -> str:
+    """SQL expression: jsonb cotation document `doc` → ordered array."""
+    return f"""
+    coalesce((
+        SELECT jsonb_agg(e.item ORDER BY rk.ord NULLS LAST, e.grade COLLATE "C", e.pos)
+          FROM (
+                SELECT jsonb_build_object('grade', k, 'count', v), k, pos
+                  FROM jsonb_each(CASE WHEN jsonb_typeof({doc}) = 'object'
+                                       THEN {doc} END)
+                       WITH ORDINALITY AS x(k, v, pos)
+                UNION ALL
+                SELECT a, a->>'grade', pos
+                  FROM jsonb_array_elements(CASE WHEN jsonb_typeof({doc}) = 'array'
+                                                 THEN {doc} END)
+                       WITH ORDINALITY AS y(a, pos)
+               ) AS e(item, grade, pos)
+          LEFT JOIN grade_rank rk ON rk.g = lower(e.grade)
+    ), '[]'::jsonb)"""
+
+
+# ──────────────────────────────────────────────────────────────────────
+def writeCotations(cur, rows: list[tuple[int, dict[str, int] | list]]) -> int:
+    """
+    Write many (route_id, cotations) pairs with batched
+    UPDATE … FROM (VALUES …) statements, sorting each document in SQL;
+    return #routes updated.
+    """
+    if not rows:
+        return 0
+    updated = psycopg2.extras.execute_values(
+        cur,
+        f"""
+        WITH {_grade_rank_cte(cur)}
+        UPDATE route
+           SET ai_cotations = {_sorted_sql("v.cot")}
+          FROM (VALUES %s) AS v(id, cot)
+         WHERE route.id = v.id
+        RETURNING route.id
+        """,
+        [(rid, jsonb(cot)) for rid, cot in rows],
+        template="(%s, %s::jsonb)",
+        page_size=UPDATE_PAGE_SIZE,
+        fetch=True,
+    )
+    return len(updated)
 
 
 # ──────────────────────────────────────────────────────────────────────
 def ExportRoutes(csv_filename: str | Path) -> None:
     """Dump the whole «route» table to a CSV file."""
     load_dotenv()
-    db   = ConnectDB(**postgresql_config)
-    conn = db.connect()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur, open(csv_filename, "w", encoding="utf-8", newline="") as fout:
             cur.copy_expert(
                 """
@@ -36,11 +116,63 @@ def ExportRoutes(csv_filename: str | Path) -> None:
                 fout,
             )
         print(f"[ExportRoutes] exported → {csv_filename}")
-    finally:
-        conn.close()
 
 
 # ──────────────────────────────────────────────────────────────────────
+# CSV import runs server-side: COPY into a temp table, then one
+# UPDATE … FROM (or the same plan as a SELECT for --dry-run).
+#
+# Unparsable JSON is skipped, not fatal.  PostgreSQL 16+ validates it
+# with pg_input_is_valid(); older servers fall back to a plpgsql
+# EXCEPTION block, which costs one subtransaction per row.
+
+_PG_INPUT_IS_VALID = 160000     # server_version introducing pg_input_is_valid
+
+_TRY_JSONB_SQL = """
+CREATE OR REPLACE FUNCTION pg_temp.try_jsonb(txt text) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    RETURN txt::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END
+$$
+"""
+
+def _try_jsonb(cur, txt: str) -> str:
+    """SQL expression: text `txt` → jsonb, NULL if it is not valid JSON."""
+    if cur.connection.server_version >= _PG_INPUT_IS_VALID:
+        return f"CASE WHEN pg_input_is_valid({txt}, 'jsonb') THEN {txt}::jsonb END"
+    return f"pg_temp.try_jsonb({txt})"
+
+
+def _planned_sql(cur) -> str:
+    """CTEs «src» (parsed CSV rows) and «planned» (id → sorted array)."""
+    return f"""
+WITH src AS (
+    SELECT t.n,
+           CASE WHEN btrim(t.id) ~ '^[0-9]+$' THEN btrim(t.id)::bigint END AS id,
+           {_try_jsonb(cur, "c.txt")} AS doc
+      FROM tmp_cot t,
+           LATERAL (SELECT coalesce(nullif(replace(btrim(t.cotations), '""', '"'), ''),
+                                    '{{}}') AS txt) AS c
+     WHERE %(limit)s::bigint IS NULL OR t.n <= %(limit)s::bigint
+),
+{_grade_rank_cte(cur)},
+planned AS (
+    SELECT DISTINCT ON (s.id)              -- last CSV line wins
+           s.id,
+           {_sorted_sql("s.doc")} AS cot
+      FROM src s
+     WHERE s.id IS NOT NULL
+       AND s.doc IS NOT NULL                -- unparsable JSON → skipped
+     ORDER BY s.id, s.n DESC
+)
+"""
+
+_TODO_SQL = "(NOT %(skip)s OR r.ai_cotations IS NULL OR r.ai_cotations = '[]'::jsonb)"
+
+
 def produceRoutesCotationsInBulk(
     csv_path: str | Path,
     *,
@@ -50,74 +182,67 @@ def produceRoutesCotationsInBulk(
 ) -> None:
     """Bulk-import JSONB cotations from a CSV (id ; cotations)."""
     load_dotenv()
-    db   = ConnectDB(**postgresql_config)
-    conn = db.connect()
-
-    dry_log: list[tuple[int, list[dict[str, int]]]] = []
-    processed = updated = 0
-
-    try:
-        with open(csv_path, "r", encoding="utf-8") as fin:
-            reader = csv.DictReader(fin, delimiter=";")
-            for row in reader:
-                if limit is not None and processed >= limit:
-                    break
-                processed += 1
-
-                rid_str = (row.get("id") or "").strip()
-                if not rid_str.isdigit():
-                    continue
-                rid = int(rid_str)
-
-                # ── skip routes that already have data ───────────────────────
-                if skip:
-                    with conn.cursor() as cur:
-                        cur.execute("SELECT ai_cotations FROM route WHERE id = %s", (rid,))
-                        existing = cur.fetchone()
-                    if existing and existing[0] not in (None, [], "[]", ""):
-                        continue
+    params = {"limit": limit, "skip": skip}
 
-                raw = (row.get("cotations") or "").strip().replace('""', '"')
-                try:
-                    cot_dict = json.loads(raw) if raw else {}
-                except json.JSONDecodeError:
-                    continue
+    with get_conn() as conn:
+        try:
+            with conn.cursor() as cur, open(csv_path, "r", encoding="utf-8-sig") as fin:
+                # ── stage the CSV in one COPY ────────────────────────────────
+                header = next(csv.reader([fin.readline()], delimiter=";"), [])
+                header = [h.strip() for h in header]
+                if "id" not in header or "cotations" not in header:
+                    raise ValueError(f"{csv_path}: header needs «id» and «cotations»")
 
-                sorted_dict = sort_cotations(cot_dict)
-                cot_list    = [{"grade": g, "count": c} for g, c in sorted_dict.items()]
+                cols = sql.SQL(", ").join(map(sql.Identifier, header))
+                cur.execute(sql.SQL(
+                    "CREATE TEMP TABLE tmp_cot (n bigserial, {}) ON COMMIT DROP"
+                ).format(sql.SQL(", ").join(
+                    sql.SQL("{} text").format(sql.Identifier(h)) for h in header
+                )))
+                cur.copy_expert(sql.SQL(
+                    "COPY tmp_cot ({}) FROM STDIN "
+                    "WITH (FORMAT csv, DELIMITER ';', QUOTE '\"')"
+                ).format(cols).as_string(cur), fin)
+                cur.execute("SELECT count(*) FROM tmp_cot")
+                processed = cur.fetchone()[0]
+                if limit is not None:
+                    processed = min(processed, limit)
+                if conn.server_version < _PG_INPUT_IS_VALID:
+                    cur.execute(_TRY_JSONB_SQL)
 
+                # ── write / summary ─────────────────────────────────────────
                 if dry_run:
-                    dry_log.append((rid, cot_list))
-                    continue
-
-                with conn.cursor() as cur:
                     cur.execute(
-                        """
-                        UPDATE route
-                           SET ai_cotations = %s::jsonb
-                         WHERE id = %s
+                        _planned_sql(cur) + f"""
+                        SELECT p.id, p.cot
+                          FROM planned p
+                          JOIN route r ON r.id = p.id
+                         WHERE {_TODO_SQL}
+                         ORDER BY p.id
                         """,
-                        (json.dumps(cot_list, ensure_ascii=False), rid),
+                        params,
                     )
-                    if cur.rowcount:
-                        updated += 1
-
-        if not dry_run:
-            conn.commit()
-
-        # ── summary ─────────────────────────────────────────────────────────
-        if dry_run:
-            print("[Bulk] DRY-RUN – planned updates:")
-            for rid, arr in dry_log:
-                print(f"  • id {rid} → {arr}")
-        else:
-            print(f"[Bulk] processed {processed} rows — updated {updated}")
+                    print("[Bulk] DRY-RUN – planned updates:")
+                    for rid, arr in cur:
+                        print(f"  • id {rid} → {arr}")
+                else:
+                    cur.execute(
+                        _planned_sql(cur) + f"""
+                        UPDATE route r
+                           SET ai_cotations = p.cot
+                          FROM planned p
+                         WHERE r.id = p.id
+                           AND {_TODO_SQL}
+                        """,
+                        params,
+                    )
+                    updated = cur.rowcount
+                    conn.commit()
+                    print(f"[Bulk] processed {processed} rows — updated {updated}")
 
-    except Exception as e:
-        conn.rollback()
-        print(f"[Bulk] ERROR: {e}")
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            print(f"[Bulk] ERROR: {e}")
 
 
 # ──────────────────────────────────────────────────────────────────────
@@ -129,50 +254,53 @@ def produceRouteCotations(
 ) -> None:
     """Update a **single** route’s ai_cotations from the CSV."""
     load_dotenv()
-    db   = ConnectDB(**postgresql_config)
-    conn = db.connect()
-
     found = False
-    try:
-        with open(csv_path, "r", encoding="utf-8") as fin:
-            reader = csv.DictReader(fin, delimiter=";")
-            for row in reader:
-                if (row.get("id") or "").strip() != str(route_id):
-                    continue
-                found = True
-
-                raw = (row.get("cotations") or "").strip().replace('""', '"')
-                try:
-                    cot_dict = json.loads(raw) if raw else {}
-                except json.JSONDecodeError as exc:
-                    print(f"[Single] bad JSON for {route_id}: {exc}")
-                    return
-
-                sorted_dict = sort_cotations(cot_dict)
-                cot_list    = [{"grade": g, "count": c} for g, c in sorted_dict.items()]
+    with get_conn() as conn:
+        try:
+            with open(csv_path, "r", encoding="utf-8") as fin:
+                reader = csv.DictReader(fin, delimiter=";")
+                for row in reader:
+                    if (row.get("id") or "").strip() != str(route_id):
+                        continue
+                    found = True
 
-                if dry_run:
-                    print(f"[Single] DRY-RUN — would set {route_id} → {cot_list}")
-                    return
+                    raw    = (row.get("cotations") or "").strip().replace('""', '"')
+                    params = {"doc": raw or "{}", "id": route_id}
 
-                with conn.cursor() as cur:
-                    cur.execute(
+                    with conn.cursor() as cur:
+                        head = f"""
+                            WITH {_grade_rank_cte(cur)},
+                                 src AS (SELECT %(doc)s::jsonb AS doc)
                         """
-                        UPDATE route
-                           SET ai_cotations = %s::jsonb
-                         WHERE id = %s
-                        """,
-                        (json.dumps(cot_list, ensure_ascii=False), route_id),
-                    )
-                    conn.commit()
-                print(f"[Single] route {route_id} updated.")
-                return
+                        try:
+                            if dry_run:
+                                cur.execute(
+                                    head + f"SELECT {_sorted_sql('s.doc')} FROM src s",
+                                    params,
+                                )
+                                cot_list = cur.fetchone()[0]
+                                print(f"[Single] DRY-RUN — would set {route_id} → {cot_list}")
+                                return
+                            cur.execute(
+                                head + f"""
+                                UPDATE route
+                                   SET ai_cotations = {_sorted_sql('s.doc')}
+                                  FROM src s
+                                 WHERE route.id = %(id)s
+                                """,
+                                params,
+                            )
+                        except psycopg2.DataError as exc:
+                            conn.rollback()
+                            print(f"[Single] bad JSON for {route_id}: {exc}")
+                            return
+                        conn.commit()
+                    print(f"[Single] route {route_id} updated.")
+                    return
 
-        if not found:
-            print(f"[Single] id {route_id} not found in {csv_path}")
+            if not found:
+                print(f"[Single] id {route_id} not found in {csv_path}")
 
-    except Exception as e:
-        conn.rollback()
-        print(f"[Single] ERROR for {route_id}: {e}")
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            print(f"[Single] ERROR for {route_id}: {e}")
@@ -0,0 +1,17 @@
+# Databases/DbSql.py
+# ======================================================================
+# SQL fragments and cursor settings shared by the DB-side commands
+# (AI/AiOps.py, auxi/stats.py, auxi/nbChecker.py).  Kept free of any
+# openai / pandas import so the auxi scripts stay light.
+# ======================================================================
+
+# FR > EN > IT pick of the jsonb «description» (first non-empty one):
+# the text GPT is given, hence the text every filter must look at
+PICK_LANG_SQL = (
+    "coalesce(nullif(description->>'fr', ''), "
+    "nullif(description->>'en', ''), "
+    "nullif(description->>'it', ''), '')"
+)
+
+# rows fetched per round-trip by the server-side (named) cursors
+ITERSIZE = 2000
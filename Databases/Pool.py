@@ -0,0 +1,62 @@
+# Databases/Pool.py
+# ======================================================================
+# Process-wide psycopg2 connection pool.  The pool is created on first
+# use (so `main.py -h` never touches the DB) and connections are handed
+# out through a context manager:
+#
+#     with get_conn() as conn:
+#         ...                # commit on success, rollback on error
+# ======================================================================
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool
+
+from Databases.DbParams import postgresql_config
+
+MIN_CONN = 2
+MAX_CONN = 16
+
+_POOL: ThreadedConnectionPool | None = None
+_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadedConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _LOCK:
+            if _POOL is None:
+                _POOL = ThreadedConnectionPool(
+                    minconn=MIN_CONN, maxconn=MAX_CONN, **postgresql_config
+                )
+    return _POOL
+
+
+@contextmanager
+def get_conn() -> Iterator[PgConnection]:
+    """Borrow a pooled connection; commit on exit, rollback on error."""
+    pool = _pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def close_pool() -> None:
+    """Close every pooled connection (next get_conn() re-opens the pool)."""
+    global _POOL
+    with _LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
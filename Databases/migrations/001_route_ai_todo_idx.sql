@@ -0,0 +1,11 @@
+-- Databases/migrations/001_route_ai_todo_idx.sql
+-- ======================================================================
+-- Partial GIN index backing AiOpsCotationsExtended._query_work
+-- (gpt-bulk / gpt-batch with --skip): only live routes that still have
+-- no ai_cotations are indexed, keyed by their activities.
+-- ======================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS route_ai_todo_idx
+    ON route USING gin (activities)
+ WHERE status = '1'
+   AND (ai_cotations IS NULL OR ai_cotations = '[]'::jsonb);
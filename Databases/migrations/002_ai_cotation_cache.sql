@@ -0,0 +1,12 @@
+-- Databases/migrations/002_ai_cotation_cache.sql
+-- ======================================================================
+-- GPT answer cache used by AI/AiOps.py: one row per distinct
+-- (model + prompt + description) hash, holding the extracted
+-- "difficulties" object.  Rows can be deleted at any time.
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS ai_cotation_cache (
+    desc_hash  bytea       PRIMARY KEY,
+    result     jsonb       NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
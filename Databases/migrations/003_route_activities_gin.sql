@@ -0,0 +1,11 @@
+-- Databases/migrations/003_route_activities_gin.sql
+-- ======================================================================
+-- GIN index for the «activities ?| array[...]» filter of auxi/stats.py
+-- and auxi/nbChecker.py, which scan every live route (not only the ones
+-- still missing ai_cotations, see 001).  Default jsonb_ops: the
+-- jsonb_path_ops class does not support ?|.
+-- ======================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS route_activities_gin
+    ON route USING gin (activities)
+ WHERE status = '1';
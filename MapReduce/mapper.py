@@ -6,16 +6,27 @@ Mapper step
 • Keeps rows whose description mentions *any* climbing grade
   (modern French OR Roman/UIAA)
 • Writes MapperOutput.csv   id ; description
+
+Filters run column-wise on the whole DataFrame; the grade test is a
+single case-insensitive scan per description: a compiled Hyperscan DFA
+when the hyperscan package is installed, else RE2 (google-re2), else re.
 """
 
-import csv
-import json
-import re
-import sys
 from pathlib import Path
 
+import orjson
 import pandas as pd
 
+try:                    # RE2: linear-time DFA, no backtracking
+    import re2 as _re
+except ImportError:     # pure-Python environments
+    import re as _re
+
+try:                    # Hyperscan: SIMD multi-pattern DFA (x86-64 only)
+    import hyperscan as _hs
+except ImportError:
+    _hs = None
+
 # ────────────────────────── config ──────────────────────────────
 INPUT_CSV  : Path = Path("/app/data/route.csv")
 OUTPUT_CSV : Path = Path("/app/data/MapperOutput.csv")
@@ -25,6 +36,7 @@ desired_activities = {
     "bouldering",
     "mountain_climbing",
 }
+_WANTED = frozenset(desired_activities)
 
 # ----------------------------------------------------------------
 # Arabic / French-style grades (unchanged)
@@ -58,66 +70,133 @@ _roman_re = (
 # final pattern (word-boundaries on both sides)
 cotations_pattern = rf"\b(?:{_arabic_re}|{_roman_re})\b"
 
-_cotation_regex = re.compile(cotations_pattern, re.IGNORECASE)
+# RE2 and Hyperscan only know ASCII \b, so «névé» would yield a «V».
+# For them the same test is spelled with explicit Unicode boundaries
+# (word = letter | number | «_», as for Python's \w).  Boundaries are
+# consumed instead of asserted (neither engine has lookarounds), which
+# is enough for a yes/no scan.  What \b actually accepts:
+#   • a bare grade (no «+/-»: the «+» after «6a» is a boundary itself)
+#     between two non-word characters,
+#   • «4+» / «5+» – no bare «4» / «5» – only when a word char follows.
+_W  = r"[\p{L}\p{N}_]"
+_NW = r"[^\p{L}\p{N}_]"
+_bare_re = r"[1-3]|[3-9][abc]|I{1,3}|IV|VI{0,3}|IX|XI?"
+unicode_cotations_pattern = (
+    rf"(?:^|{_NW})(?:(?:{_bare_re})(?:$|{_NW})|[45]\+{_W})"
+)
+
+# inline (?i): the same flag syntax works for both `re` and RE2
+_cotation_regex = _re.compile(
+    f"(?i){cotations_pattern if _re.__name__ == 're' else unicode_cotations_pattern}"
+)
+
+# same test as one Hyperscan database (UCP + UTF8: \p{…} is Unicode)
+_hs_db = None
+if _hs is not None:
+    _hs_db = _hs.Database(mode=_hs.HS_MODE_BLOCK)
+    _hs_db.compile(
+        expressions=[unicode_cotations_pattern.encode()],
+        flags=[
+            _hs.HS_FLAG_CASELESS | _hs.HS_FLAG_SINGLEMATCH
+            | _hs.HS_FLAG_UTF8 | _hs.HS_FLAG_UCP
+        ],
+    )
+
+
+def _on_match(_id, _start, _end, _flags, found: list) -> None:
+    found.append(True)  # SINGLEMATCH: called at most once per scan
+
 
 # ────────────────────────── helpers ─────────────────────────────
 def contains_cotation(text: str) -> bool:
     """
     Detect at least one grade in `text`.
-    • Arabic grades are searched case-insensitively in lower-case text
-    • Roman grades are searched in UPPER-case text
+    A single case-insensitive scan covers both Arabic («6a», «6A»)
+    and Roman («VI», «vi») grades.
     """
     if pd.isna(text):
         return False
-    txt = str(text)
-    return bool(
-        _cotation_regex.search(txt.lower())   # Arabic / French
-        or _cotation_regex.search(txt.upper())  # Roman UIAA
-    )
+    if _hs_db is not None:
+        found: list[bool] = []
+        _hs_db.scan(str(text).encode(), match_event_handler=_on_match, context=found)
+        return bool(found)
+    return _cotation_regex.search(str(text)) is not None
+
+
+# Regression guard for the boundary rewrite: accented neighbours must
+# not turn «névé» into a grade.  Checked once at import against the
+# expected answers of Python's Unicode \b; a disagreeing engine is
+# dropped in favour of the stdlib `re` pattern.
+_BOUNDARY_CASES = {
+    "névé raide": False,
+    "départ du névé": False,
+    "Vé": False,
+    "passage en V, puis 6a+": True,
+    "IV- au départ": True,
+    "5+ ": False,
+    "5+x": True,
+    "4c+ finale": True,
+}
 
-# ────────────────────────── main mapper ─────────────────────────
-def mapper() -> None:
-    output_rows: list[dict[str, str]] = []
-
-    with INPUT_CSV.open("r", encoding="utf-8-sig") as fin:
-        reader = csv.DictReader(fin, delimiter=";")
-
-        for row in reader:
-            # filter by activity -------------------------------------------------
-            try:
-                acts = json.loads(row.get("activities", "[]"))
-            except Exception:
-                acts = []
-
-            if not any(a in desired_activities for a in acts):
-                continue
-
-            # filter by status ---------------------------------------------------
-            if (row.get("status") or "0") != "1":
-                continue
-
-            # choose FR > EN > IT description -----------------------------------
-            try:
-                desc_blob = json.loads(row.get("description", "{}"))
-            except Exception:
-                desc_blob = {}
-            description = (
-                desc_blob.get("fr") or desc_blob.get("en") or desc_blob.get("it") or ""
-            )
-            if not description.strip():
-                continue
-
-            # keep only if a grade is present ------------------------------------
-            if not contains_cotation(description):
-                continue
-
-            route_id = row.get("\ufeffid") or row.get("id") or ""
-            output_rows.append({"id": route_id, "description": description})
-
-    # write CSV -----------------------------------------------------------------
-    df = pd.DataFrame(output_rows)
-    df.to_csv(OUTPUT_CSV, sep=";", index=False)
-    print(f"[Mapper] kept {len(df)} rows → {OUTPUT_CSV}")
-    df.info()
+if any(contains_cotation(t) != want for t, want in _BOUNDARY_CASES.items()):
+    print("[Mapper] grade engine disagrees with Unicode \\b – using stdlib re")
+    import re as _re
+    _hs_db = None
+    _cotation_regex = _re.compile(f"(?i){cotations_pattern}")
 
+# ────────────────────────── main mapper ─────────────────────────
+def _loads(raw: str, default):
+    try:
+        return orjson.loads(raw) if raw else default
+    except orjson.JSONDecodeError:
+        return default
+
+
+def mapper(
+    input_csv : str | Path = INPUT_CSV,
+    output_csv: str | Path = OUTPUT_CSV,
+) -> None:
+    df = pd.read_csv(
+        input_csv,
+        sep=";",
+        dtype=str,
+        engine="c",
+        encoding="utf-8-sig",
+        keep_default_na=False,
+        usecols=["id", "status", "activities", "description"],
+    )
 
+    # filter by status ----------------------------------------------------
+    df = df[df["status"] == "1"]
+
+    # filter by activity --------------------------------------------------
+    # dtype=bool: an empty object Series would index columns, not rows
+    acts = df["activities"].map(lambda raw: _loads(raw, []))
+    df   = df[acts.map(lambda a: isinstance(a, list) and not _WANTED.isdisjoint(a)).astype(bool)]
+
+    if df.empty:
+        out = pd.DataFrame(columns=["id", "description"])
+    else:
+        # choose FR > EN > IT description --------------------------------
+        blobs = df["description"].map(lambda raw: _loads(raw, {}))
+        blobs = blobs.map(lambda b: b if isinstance(b, dict) else {})
+        langs = (
+            pd.json_normalize(blobs.tolist())
+              .reindex(columns=["fr", "en", "it"])
+              .replace("", pd.NA)
+        )
+        langs.index = df.index
+        description = langs["fr"].fillna(langs["en"]).fillna(langs["it"]).fillna("")
+
+        # keep only non-empty descriptions that mention a grade ----------
+        # (all-NA language columns are object/float, not str: no .str)
+        keep = (
+            description.map(lambda s: isinstance(s, str) and s.strip() != "").astype(bool)
+            & description.map(contains_cotation).astype(bool)
+        )
+        out = pd.DataFrame({"id": df["id"], "description": description})[keep]
+
+    # write CSV -----------------------------------------------------------
+    out.to_csv(output_csv, sep=";", index=False)
+    print(f"[Mapper] kept {len(out)} rows → {output_csv}")
+    out.info()
@@ -1,83 +1,91 @@
 # MapReduce/reducer.py
 
-import json, re
+import asyncio
 from pathlib import Path
+import orjson
 import pandas as pd
 
-from AI.AiOps import AiOps
+from AI.AiOps import AiOps, difficulties_of, gpt_concurrency
 from AI.ConnectAI import ConnectAI
 from Parameters.cotations import valid_difficulties
 from Utils.grade_sort    import sort_and_array  # ← NEW import
+from Utils.json_extract  import extract_json
 
-_JSON_RE = re.compile(
-    r"""
-    \{                           # opening brace
-      [^\{\}]*?"difficulties"\s*:\s*\{[^{}]*\}   # inner object
-      [^{}]*?"ambiguous"\s*:\s*(?:true|false)
-      [^{}]*?
-    \}
-    """,
-    re.IGNORECASE|re.DOTALL|re.VERBOSE,
-)
 
-def _extract_json(text: str) -> dict | None:
-    m = _JSON_RE.search(text)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(0))
-    except json.JSONDecodeError:
-        return None
+async def _reduce_one(
+    ai_ops: AiOps, sem: asyncio.Semaphore, rid, text: str
+) -> tuple:
+    async with sem:
+        raw = await ai_ops.ask_gpt_async(text)
+    print(f"\n── GPT raw • {rid} ─────────────────────────────\n{raw}\n")
 
-def reducer(
-    input_csv_path : str|Path = "/app/data/MapperOutput.csv",
-    output_csv_path: str|Path = "/app/data/result.csv",
-) -> None:
+    parsed = extract_json(raw)
+    if parsed is None:
+        print(f"[Reducer] route {rid} → JSON block NOT found → ambiguous")
+        parsed = {"difficulties": {}, "ambiguous": True}
+    else:
+        print(f"[Reducer] route {rid} → parsed JSON {parsed}")
+
+    # Normalize & filter into a dict
+    clean_dict: dict[str, int] = {}
+    for grade, count in difficulties_of(parsed).items():
+        g = grade.lower().strip()
+        if g in valid_difficulties:
+            try:
+                clean_dict[g] = int(count)
+            except Exception:
+                clean_dict[g] = 0
+
+    # Convert dict → ordered array
+    arr = sort_and_array(clean_dict)
+    return rid, orjson.dumps(arr).decode(), bool(parsed.get("ambiguous", True))
+
+
+async def _reduce(input_csv_path, output_csv_path, chunksize: int) -> int:
     ai_ops = AiOps()
-    df = pd.read_csv(
+    sem    = asyncio.Semaphore(gpt_concurrency())
+    total  = 0
+
+    chunks = pd.read_csv(
         input_csv_path,
         sep=";",
         quotechar='"',
-        engine="python",
+        engine="c",
         on_bad_lines="skip",
+        chunksize=chunksize,
     )
+    for chunk in chunks:
+        answers = await asyncio.gather(*(
+            _reduce_one(ai_ops, sem, rid, text if isinstance(text, str) else "")
+            for rid, text in chunk[["id", "description"]].itertuples(index=False)
+        ))
 
-    cotations_out:  list[str]  = []
-    ambiguous_out:  list[bool] = []
+        # append this chunk, header only once
+        pd.DataFrame(answers, columns=["id", "cotations", "ambiguous"]).to_csv(
+            output_csv_path,
+            sep=";",
+            index=False,
+            mode="a" if total else "w",
+            header=not total,
+        )
+        total += len(answers)
 
-    for _, row in df.iterrows():
-        rid  = row["id"]
-        text = row.get("description", "") or ""
-        raw  = ai_ops.generate_response(text)
-        print(f"\n── GPT raw • {rid} ─────────────────────────────\n{raw}\n")
+    if not total:
+        pd.DataFrame(columns=["id", "cotations", "ambiguous"]).to_csv(
+            output_csv_path, sep=";", index=False
+        )
+    return total
 
-        parsed = _extract_json(raw)
-        if parsed is None:
-            print(f"[Reducer] route {rid} → JSON block NOT found → ambiguous")
-            parsed = {"difficulties": {}, "ambiguous": True}
-        else:
-            print(f"[Reducer] route {rid} → parsed JSON {parsed}")
 
-        # Normalize & filter into a dict
-        clean_dict: dict[str, int] = {}
-        for grade, count in parsed["difficulties"].items():
-            g = grade.lower().strip()
-            if g in valid_difficulties:
-                try:
-                    clean_dict[g] = int(count)
-                except Exception:
-                    clean_dict[g] = 0
-
-        # Convert dict → ordered array
-        arr = sort_and_array(clean_dict)
-
-        cotations_out.append(json.dumps(arr, ensure_ascii=False))
-        ambiguous_out.append(bool(parsed["ambiguous"]))
-
-    # Write final CSV
-    df["cotations"]  = cotations_out
-    df["ambiguous"] = ambiguous_out
-    df[["id","cotations","ambiguous"]].to_csv(
-        output_csv_path, sep=";", index=False
-    )
-    print(f"\n[Reducer] done → {output_csv_path}")
+def reducer(
+    input_csv_path : str|Path = "/app/data/MapperOutput.csv",
+    output_csv_path: str|Path = "/app/data/result.csv",
+    chunksize      : int      = 500,
+) -> None:
+    """
+    Stream MapperOutput.csv `chunksize` rows at a time; each chunk is
+    sent to GPT concurrently (OPENAI_CONCURRENCY) and appended to the
+    result CSV before the next one is read.
+    """
+    total = asyncio.run(_reduce(input_csv_path, output_csv_path, chunksize))
+    print(f"\n[Reducer] done ({total} routes) → {output_csv_path}")
@@ -4,7 +4,8 @@
 # AI/AiParams.VALID_SET, interleaving UIAA Roman grades just before the
 # French grades they historically correspond to.
 #
-# Public helper:
+# Public helpers:
+#   GRADE_ORDER                           canonical order (tuple)
 #   sort_cotations(dict[str,int]) -> dict[str,int]
 # =====================================================================
 
@@ -58,22 +59,33 @@ _ORDER: list[str] = [
     "9a", "9a+", "9b", "9b+", "9c", "9c+",
 ]
 
-# O(1) lookup for ranking
-_RANK: dict[str, int] = {g.lower(): i for i, g in enumerate(_ORDER)}
+# O(1) lookup for ranking – canonical spelling *and* lower-case, so the
+# usual inputs ("6a", "IV+") hit without calling .lower()
+_RANK: dict[str, int] = (
+    {g.lower(): i for i, g in enumerate(_ORDER)}
+    | {g: i for i, g in enumerate(_ORDER)}
+)
+_UNKNOWN = len(_ORDER)          # ranks after every known grade
+
+# read-only view for callers that rank in SQL (Databases/DbOps)
+GRADE_ORDER: tuple[str, ...] = tuple(_ORDER)
+
+
+def _rank(grade: str) -> int:
+    r = _RANK.get(grade)
+    return r if r is not None else _RANK.get(grade.lower(), _UNKNOWN)
 
 
 # ---------------------------------------------------------------------
 def sort_cotations(cotes: dict[str, int]) -> dict[str, int]:
     """
     Return a **new** dict with keys in canonical difficulty order.
-    Any grade not in the list is left in place but appended *after*
-    all known grades (preserving its original relative order).
+    Any grade not in the list is appended *after* all known grades, in
+    code-point order of its spelling – the order Databases/DbOps uses
+    when it sorts in SQL (jsonb objects do not keep key order), so
+    --dry-run output matches what gets written.
     """
-    known   = [k for k in cotes if k.lower() in _RANK]
-    unknown = [k for k in cotes if k.lower() not in _RANK]
-
-    known_sorted = sorted(known, key=lambda k: _RANK[k.lower()])
-    return {k: cotes[k] for k in (*known_sorted, *unknown)}
+    return dict(sorted(cotes.items(), key=lambda kv: (_rank(kv[0]), kv[0])))
 
 def sort_and_array(cotes: dict[str, int]) -> list[dict[str, int]]:
     """
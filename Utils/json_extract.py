@@ -0,0 +1,150 @@
+# Utils/json_extract.py
+# =====================================================================
+# Pull the GPT answer object out of free text (pre-text, Markdown
+# fences, trailing commentary …).  One brace-matching pass keeps a
+# stack of open «{» offsets and records every block as it closes –
+# linear in the text length, no regex backtracking.  Answers requested
+# with response_format=json_schema are bare JSON and parse directly.
+#
+# Blocks are then tried outermost first, and each orjson call costs the
+# length of its block, so nested blocks must not be re-parsed:
+#   • a block that parses is searched as a tree; the blocks inside it
+#     are never parsed on their own;
+#   • a block that fails at offset p makes every inner block that
+#     straddles p fail as well (the parser was already inside it),
+#     unless it failed on orjson's nesting-depth limit;
+#   • only blocks mentioning "difficulties" are tried, and the text
+#     handed to orjson is capped at _PARSE_BUDGET × len(text), so even
+#     crafted input stays linear.
+#
+# The pass runs natively when the optional Rust extension is installed
+# (pip install ./climbing_json); this module is the pure-Python fallback.
+#
+# Public helper:
+#   extract_json(str) -> dict | None
+#     first {...} block (by start offset) that parses and has
+#     "difficulties"
+# =====================================================================
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any
+
+import orjson
+
+try:                    # Rust (pyo3 / maturin) build of the same pass
+    from climbing_json import json_object_spans as _native_spans
+except ImportError:     # extension not built – pure Python below
+    _native_spans = None
+
+_MARKER = '"difficulties"'
+
+# total characters handed to orjson, as a multiple of the text length
+_PARSE_BUDGET = 4
+
+
+# ---------------------------------------------------------------------
+def _object_spans(text: str) -> list[tuple[int, int]]:
+    """
+    (start, end) of every brace-balanced {...} block of `text`, end
+    exclusive, sorted by start.  Braces inside JSON strings (and
+    escaped quotes) are ignored; a «{» that never closes yields nothing.
+    Quotes are only tracked inside braces, so prose before the first
+    «{» cannot open a string.
+    """
+    spans: list[tuple[int, int]] = []
+    stack: list[int] = []
+    in_str  = False
+    escaped = False
+    for j, c in enumerate(text):
+        if in_str:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_str = False
+        elif c == "{":
+            stack.append(j)
+        elif not stack:
+            continue
+        elif c == '"':
+            in_str = True
+        elif c == "}":
+            spans.append((stack.pop(), j + 1))
+    spans.sort()
+    return spans
+
+
+def _find_answer(obj: Any) -> dict[str, Any] | None:
+    """
+    First dict carrying "difficulties" in `obj`, in document order
+    (pre-order, iterative: the tree may be arbitrarily deep).
+    """
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "difficulties" in node:
+                return node
+            stack.extend(reversed(node.values()))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None
+
+
+def extract_json(text: str) -> dict[str, Any] | None:
+    """
+    Return the first {...} object in `text` that is valid JSON and
+    carries a "difficulties" key; None if there is none.
+    """
+    # fast path: the whole answer is the object (structured output)
+    try:
+        obj = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        obj = None
+    if isinstance(obj, dict) and "difficulties" in obj:
+        return obj
+
+    # offsets of the key, so a block is tested in O(log n), not O(len)
+    marks: list[int] = []
+    k = text.find(_MARKER)
+    while k != -1:
+        marks.append(k)
+        k = text.find(_MARKER, k + 1)
+    if not marks:
+        return None
+
+    spans  = _native_spans(text) if _native_spans is not None else _object_spans(text)
+    budget = _PARSE_BUDGET * len(text)
+    done   = 0                          # blocks starting before it are covered
+    failed: list[tuple[int, int]] = []  # (end, error offset) of enclosing failures
+    for start, end in spans:
+        if start < done:
+            continue                    # inside a block already parsed
+        m = bisect_left(marks, start)
+        if m == len(marks) or marks[m] + len(_MARKER) > end:
+            continue
+
+        while failed and failed[-1][0] <= start:
+            failed.pop()
+        if failed and start < failed[-1][1] < end:
+            failed.append((end, failed[-1][1]))     # fails at the same offset
+            continue
+
+        budget -= end - start
+        if budget < 0:
+            return None
+        try:
+            obj = orjson.loads(text[start:end])
+        except orjson.JSONDecodeError as exc:
+            # too deep is not inherited: inner blocks are shallower
+            if "recursion" not in exc.msg:
+                failed.append((end, start + exc.pos))
+            continue
+        done = end
+        found = _find_answer(obj)
+        if found is not None:
+            return found
+    return None
@@ -8,14 +8,36 @@ Répond aux questions suivantes, sans passer par des CSV intermédiaires :
 2) YYY grades : total de couples (grade, count) extraits après post-process ?
 3) ZZ % ambiguïté : % de JSON où ambiguous=true ?
 4) Tokens / coût / temps : estimations comme pour le Markdown (ou N/A si pas suivi)
+
+Usage (depuis la racine du projet, le paquet Databases doit être importable) :
+  docker compose exec ai-climbing-cotations-app python3 main.py stats [--cache]
+  python3 -m auxi.stats [--cache]
+
+Avec --cache (paquet diskcache requis), les chiffres sont conservés
+dans STATS_CACHE_DIR (variable d'environnement du même nom) et
+réutilisés tant que ni le contenu de route ni la requête ou le calcul
+n'ont changé.
 """
 
 import os
-import re
-import json
+from argparse import ArgumentParser
+
+import orjson
 import psycopg2
+from psycopg2.extras import register_default_jsonb
 from dotenv import load_dotenv
 
+# choix de la langue fr>en>it et taille des paquets du curseur serveur
+from Databases.DbSql import ITERSIZE, PICK_LANG_SQL
+
+try:                    # cache disque optionnel entre deux exécutions
+    from diskcache import Cache
+except ImportError:
+    Cache = None
+
+# jsonb décodé une seule fois, par le driver, avec orjson (C)
+register_default_jsonb(loads=orjson.loads, globally=True)
+
 # ─── Activités autorisées (mêmes que dans mapper.py) ────────────────
 ALLOWED_ACTIVITIES = {
     "bouldering",
@@ -24,81 +46,100 @@ ALLOWED_ACTIVITIES = {
 }
 
 # ─── Regex de détection de grade (idem mapper.py) ───────────────────
-_ARABIC_RE = (
-    r"(?:1|2|"
-    r"3(?:\+|[abc])?|"
-    r"4(?:\+|[ab]|c(?:\+)?)|"
-    r"5(?:\+|[abc](?:\+)?)|"
-    r"6(?:[abc](?:\+)?)|"
-    r"7(?:[abc](?:\+)?)|"
-    r"8(?:[abc](?:\+)?)|"
-    r"9(?:[abc](?:\+)?)"
-    r")"
-)
-_ROMAN_RE = (
-    r"(?:"  
-    r"I\+?|II\+?|III\+?|"
-    r"IV-?|IV\+?|"
-    r"V-?|V\+?|"
-    r"VI-?|VI\+?|"
-    r"VII-?|VII\+?|"
-    r"VIII-?|VIII\+?|"
-    r"IX-?|IX\+?|"
-    r"X-?|X\+?|"
-    r"XI-?|XI"
-    r")"
+# Même ensemble de textes reconnus que \b(?:<arabes>|<romains>)\b du
+# mapper, mais ancré et factorisé : un seul test de frontière de chaque
+# côté au lieu d'un \b à ré-essayer sur chaque alternative, et plus de
+# suffixes « +/- » optionnels (la frontière suivante les rend inutiles).
+#   arabes  : 1, 2, 3 seuls, sinon chiffre + lettre (3a … 9c)
+#   4+ / 5+ : reconnus par le mapper seulement s'ils sont collés à un mot
+#   romains : I … XI
+# Écrite en minuscules : le texte est passé une fois par lower() puis
+# comparé avec ~ (sensible à la casse), sans repli de casse à chaque
+# position comme ~*.
+_ARABIC_RE = r"[1-3]|[3-9][abc]"
+_ROMAN_RE  = r"i{1,3}|iv|vi{0,3}|ix|xi?"
+
+# regex ARE de PostgreSQL (lookbehind depuis la 9.6), \w = [[:alnum:]_]
+COTATION_SQL_RE = (
+    rf"(?<!\w)(?:(?:{_ARABIC_RE}|{_ROMAN_RE})(?!\w)|[45]\+(?=\w))"
 )
-_COTATION_REGEX = re.compile(rf"\b(?:{_ARABIC_RE}|{_ROMAN_RE})\b", re.IGNORECASE)
 
-def extract_activities(blob):
-    """
-    Toujours renvoyer une liste Python pour 'activities'.
-    • Si c'est déjà une liste, on renvoie telle quelle.
-    • Si c'est une chaîne, on tente json.loads.
-    • Sinon on renvoie [].
-    """
-    if isinstance(blob, list):
-        return blob
-    if blob is None:
-        return []
-    if isinstance(blob, str):
-        try:
-            return json.loads(blob)
-        except json.JSONDecodeError:
-            return []
-    return []
-
-def pick_lang(desc_blob):
+# ─── cache des résultats (diskcache, sur demande : --cache) ─────────
+# défaut, remplacé par $STATS_CACHE_DIR (lu après load_dotenv)
+STATS_CACHE_DIR = "/app/data/.stats_cache"
+
+# à incrémenter dès que le calcul de _scan change (comptage, tokens…)
+SCAN_VERSION = 1
+
+# Empreinte des données elles-mêmes (route n'a pas de colonne
+# updated_at, et les compteurs pg_stat_* ne sont ni transactionnels ni
+# publiés immédiatement) : nombre de lignes + somme des hachages de
+# chaque ligne.  Un parcours séquentiel sans regex ni transfert de
+# lignes ; toute écriture validée, TRUNCATE compris, change la clé.
+SNAPSHOT_SQL = """
+    SELECT count(*),
+           coalesce(sum(hashtextextended(
+               ROW(id, status, activities, description, ai_cotations)::text, 0
+           )), 0)::text
+    FROM   route
+"""
+
+# filtres du Mapper (activité + grade) et choix de la langue exécutés
+# côté serveur : seuls (id, texte retenu, ai_cotations) traversent le
+# réseau.  Index : migrations/003.
+MAPPER_SQL = f"""
+    SELECT id, btrim(d.txt), ai_cotations
+    FROM   route,
+           LATERAL (SELECT {PICK_LANG_SQL} AS txt) AS d
+    WHERE  status = '1'
+      AND  activities ?| %(acts)s::text[]
+      AND  lower(d.txt) ~ %(cot)s
+"""
+
+def _scan(conn) -> tuple:
     """
-    Si description est JSON multilingue (dict ou JSON-string), on choisit
-    fr>en>it. Sinon on retourne la chaîne brute.
+    Parcourt les routes retenues par le Mapper et renvoie
+    (routes, couples, ambigus, réduits, tokens).
     """
-    if not desc_blob:
-        return ""
-    # déjà un dict Python
-    if isinstance(desc_blob, dict):
-        return desc_blob.get("fr") or desc_blob.get("en") or desc_blob.get("it") or ""
-    # chaîne : peut être JSON, peut être brut
-    if isinstance(desc_blob, str):
-        try:
-            parsed = json.loads(desc_blob)
-            if isinstance(parsed, dict):
-                return parsed.get("fr") or parsed.get("en") or parsed.get("it") or ""
-        except json.JSONDecodeError:
-            pass
-        return desc_blob
-    # tout autre type (rare)
-    return str(desc_blob)
-
-def contains_cotation(text: str) -> bool:
-    """Détecte la présence d'au moins un grade dans le texte."""
-    return bool(_COTATION_REGEX.search(text or ""))
-
-def count_tokens(text: str) -> int:
-    """Approxime le nombre de tokens en splittant sur les espaces."""
-    return len(text.split())
-
-def main():
+    # ── 1, 2 & 3) Sélection “Mapper” (status=1, activités autorisées,
+    #    contient un grade) et ai_cotations des mêmes routes : une seule
+    #    requête, un seul parcours.
+    # curseur nommé (côté serveur) : les lignes arrivent par paquets de
+    # ITERSIZE au lieu d'être toutes chargées en mémoire
+    route_count     = 0
+    grade_pairs     = 0
+    ambiguous_count = 0
+    reduced_count   = 0
+    total_tokens    = 0
+
+    with conn.cursor(name="stats_routes") as cur:
+        cur.itersize = ITERSIZE
+        cur.execute(MAPPER_SQL, {"acts": sorted(ALLOWED_ACTIVITIES), "cot": COTATION_SQL_RE})
+
+        for _rid, text, data in cur:
+            route_count += 1
+            # ≈ un token par mot : séparateurs comptés en C, sans liste de mots
+            if text:
+                total_tokens += text.count(" ") + text.count("\n") + 1
+
+            if data is None:
+                continue
+            reduced_count += 1
+            # format actuel : tableau [{"grade", "count"}, …]
+            if isinstance(data, list):
+                grade_pairs += len(data)
+                continue
+            # ancien format : {grade: count, …, "ambiguous": bool}
+            if not isinstance(data, dict):
+                continue
+
+            ambiguous_count += bool(data.get("ambiguous"))
+            grade_pairs     += len(data) - ("ambiguous" in data)
+
+    return route_count, grade_pairs, ambiguous_count, reduced_count, total_tokens
+
+
+def main(use_cache: bool = False):
     load_dotenv()
 
     # Connexion à la BDD
@@ -109,65 +150,36 @@ def main():
         dbname=os.getenv("HDATABASE"),
         port=os.getenv("HPORT"),
     )
-    cur = conn.cursor()
-
-    # ── 1) Sélection “Mapper” : status=1, activités autorisées, contient un grade
-    cur.execute("SELECT id, description, activities FROM route WHERE status = '1'")
-    rows = cur.fetchall()
-
-    mapper_ids   = []
-    descriptions = []
-
-    for rid, desc_blob, acts_blob in rows:
-        acts = extract_activities(acts_blob)
-        if not any(a in ALLOWED_ACTIVITIES for a in acts):
-            continue
-
-        text = pick_lang(desc_blob).strip()
-        if not text:
-            continue
-        if not contains_cotation(text):
-            continue
-
-        mapper_ids.append(rid)
-        descriptions.append(text)
 
-    route_count = len(mapper_ids)
-
-    # ── 2 & 3) Pour ces mêmes routes, lire ai_cotations et accumuler stats
-    grade_pairs     = 0
-    ambiguous_count = 0
-    reduced_count   = 0
-
-    if mapper_ids:
-        placeholders = ",".join(["%s"] * route_count)
-        cur.execute(
-            f"SELECT id, ai_cotations FROM route "
-            f"WHERE id IN ({placeholders}) AND ai_cotations IS NOT NULL",
-            mapper_ids
-        )
-        for rid, cot_blob in cur.fetchall():
-            reduced_count += 1
-            # si jsonb, psycopg2 renvoie dict ; sinon on parse
-            try:
-                data = cot_blob if isinstance(cot_blob, dict) else json.loads(cot_blob)
-            except Exception:
-                data = {}
-
-            if data.get("ambiguous"):
-                ambiguous_count += 1
-            for k in data:
-                if k != "ambiguous":
-                    grade_pairs += 1
-
-    cur.close()
-    conn.close()
+    try:
+        if Cache is None and use_cache:
+            print("[stats] --cache ignoré : paquet diskcache absent")
+        if Cache is None or not use_cache:
+            counts = _scan(conn)
+        else:
+            # même instantané de la base + mêmes filtres → mêmes chiffres :
+            # le parcours complet n'est refait que si les données ont changé
+            with conn.cursor() as cur:
+                cur.execute(SNAPSHOT_SQL)
+                # requête complète (filtres, langue, regex) + version du calcul
+                key = (*cur.fetchone(), MAPPER_SQL, tuple(sorted(ALLOWED_ACTIVITIES)),
+                       COTATION_SQL_RE, SCAN_VERSION)
+            with Cache(os.getenv("STATS_CACHE_DIR", STATS_CACHE_DIR)) as cache:
+                counts = cache.get(key)
+                if counts is None:
+                    counts = _scan(conn)
+                    cache.set(key, counts)
+                else:
+                    print("[stats] résultats repris du cache (table route inchangée)")
+    finally:
+        conn.close()
+
+    route_count, grade_pairs, ambiguous_count, reduced_count, total_tokens = counts
 
     # ── 4) Estimation tokens / coût / temps
     COST_PER_1000 = 0.02   # €/1k tokens
     TIME_PER_1000 = 1.5    # sec/1k tokens
 
-    total_tokens = sum(count_tokens(t) for t in descriptions)
     cost_total   = total_tokens / 1000 * COST_PER_1000
     time_total   = total_tokens / 1000 * TIME_PER_1000
     avg_tokens   = total_tokens / route_count if route_count else 0
@@ -185,4 +197,10 @@ def main():
     print(f"   • Moyenne par route : {avg_tokens:.0f} tokens, {avg_time:.2f}s")
 
 if __name__ == "__main__":
-    main()
+    ap = ArgumentParser()
+    ap.add_argument(
+        "--cache", action="store_true",
+        help="réutilise les chiffres tant que route n'a pas changé ($STATS_CACHE_DIR)"
+    )
+    args = ap.parse_args()
+    main(use_cache=args.cache)
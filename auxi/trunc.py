@@ -4,25 +4,18 @@ drop_ai_cotations.py
 ────────────────────
 IRREVERSIBLY remove the column `ai_cotations` from the `route` table.
 
-Usage (from your project root):
-    docker compose run --rm app python drop_ai_cotations.py
+Usage (inside the running container):
+    docker compose exec ai-climbing-cotations-app \
+      python3 main.py drop-ai-cotations --yes
 """
 
-from Databases.ConnectDB import ConnectDB
-from Databases.DbParams  import postgresql_config
+from Databases.Pool import get_conn
 
 
 def main() -> None:
-    db   = ConnectDB(**postgresql_config)
-    conn = db.connect()
-
-    try:
-        with conn.cursor() as cur:
-            cur.execute("ALTER TABLE route DROP COLUMN IF EXISTS ai_cotations")
-        conn.commit()
-        print("[drop] Column ai_cotations has been removed.")
-    finally:
-        conn.close()
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("ALTER TABLE route DROP COLUMN IF EXISTS ai_cotations")
+    print("[drop] Column ai_cotations has been removed.")
 
 
 if __name__ == "__main__":
@@ -4,19 +4,16 @@ check_ai_cotations_type.py
 ───────────────────────────
 Query and print the data type of the `ai_cotations` column in the `route` table.
 
-Usage (from your project root):
-    docker compose run --rm app python check_ai_cotations_type.py
+Usage (inside the running container):
+    docker compose exec ai-climbing-cotations-app \
+      python3 main.py check-ai-cotations-type
 """
 
-from Databases.ConnectDB import ConnectDB
-from Databases.DbParams import postgresql_config
+from Databases.Pool import get_conn
 
 
 def main() -> None:
-    db = ConnectDB(**postgresql_config)
-    conn = db.connect()
-
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT
@@ -39,8 +36,6 @@ def main() -> None:
                 print(info)
             else:
                 print("Column 'ai_cotations' not found in table 'route'.")
-    finally:
-        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+// climbing_json/src/lib.rs
+// =====================================================================
+// Native twin of Utils/json_extract._object_spans: one byte pass with
+// a stack of open «{» offsets records every brace-balanced {...} block
+// of a GPT answer as it closes – linear in the text length.
+//
+// «{», «}», «"» and «\» are ASCII, so scanning UTF-8 bytes is exact.
+// Offsets are returned in characters (not bytes) so Python can slice
+// the original str with them.
+// =====================================================================
+
+use pyo3::prelude::*;
+
+/// (start, end) of every brace-balanced {...} block of `s`, end
+/// exclusive, in characters, sorted by start.  Braces inside JSON
+/// strings (and escaped quotes) are ignored; a «{» that never closes
+/// yields nothing.  Quotes are only tracked inside braces.
+#[pyfunction]
+fn json_object_spans(s: &str) -> Vec<(usize, usize)> {
+    let mut spans = Vec::new();
+    let mut stack: Vec<usize> = Vec::new();
+    let mut in_str = false;
+    let mut escaped = false;
+    let mut pos: usize = 0; // character offset of `c`
+    for &c in s.as_bytes() {
+        // UTF-8 continuation bytes do not start a character
+        if c & 0xC0 == 0x80 {
+            continue;
+        }
+        if in_str {
+            if escaped {
+                escaped = false;
+            } else if c == b'\\' {
+                escaped = true;
+            } else if c == b'"' {
+                in_str = false;
+            }
+        } else if c == b'{' {
+            stack.push(pos);
+        } else if !stack.is_empty() {
+            match c {
+                b'"' => in_str = true,
+                b'}' => {
+                    let start = stack.pop().unwrap();
+                    spans.push((start, pos + 1));
+                }
+                _ => {}
+            }
+        }
+        pos += 1;
+    }
+    spans.sort_unstable();
+    spans
+}
+
+#[pymodule]
+fn climbing_json(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(json_object_spans, m)?)?;
+    Ok(())
+}
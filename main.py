@@ -17,7 +17,9 @@
 # $ python3 main.py -h
 #
 # usage: main.py [-h]
-#                {export,map,reduce,pipeline,gpt-route,gpt-bulk,csv-route,csv-bulk}
+#                {export,map,reduce,pipeline,gpt-route,gpt-bulk,gpt-batch,
+#                 csv-route,csv-bulk,count-pending,check-ai-cotations-type,
+#                 drop-ai-cotations,stats}
 #                ...
 #
 # positional arguments (sub-commands)
@@ -27,8 +29,13 @@
 #   pipeline     export → map → reduce → (optional) DB insert
 #   gpt-route    GPT-extract cotations for ONE route (reads DB)
 #   gpt-bulk     GPT-extract cotations for MANY routes  (reads DB)
+#   gpt-batch    same as gpt-bulk, through the OpenAI Batch API (≤ 24 h)
 #   csv-route    import ONE route’s cotations from a CSV into the DB
 #   csv-bulk     import a full CSV (id ; cotations) into the DB
+#   count-pending            #routes still waiting for GPT   (auxi/nbChecker)
+#   check-ai-cotations-type  print the ai_cotations column type (auxi/typeChecker)
+#   drop-ai-cotations        DROP the ai_cotations column      (auxi/trunc)
+#   stats                    Mapper / GPT / cost statistics    (auxi/stats)
 #
 # optional arguments
 #   -h, --help   show this message and exit
@@ -45,14 +52,8 @@ import sys
 from pathlib import Path
 
 # ── internal modules ────────────────────────────────────────────────
-from Databases.DbOps import (
-    ExportRoutes,
-    produceRoutesCotationsInBulk,
-    produceRouteCotations,
-)
-from MapReduce.mapper import mapper
-from MapReduce.reducer import reducer
-from AI.AiOps import AiOpsCotationsExtended
+# imported inside each cmd_* so that `-h` and every sub-command only
+# load what they use (pandas, the OpenAI SDK, psycopg2 …)
 
 # ── default file locations ─────────────────────────────────────────
 DATA_DIR = Path("/app/data")
@@ -90,19 +91,17 @@ def _add_bool_flag(
 # sub-command functions
 # -------------------------------------------------------------------
 def cmd_export(ns: argparse.Namespace) -> None:
+    from Databases.DbOps import ExportRoutes
     ExportRoutes(str(ns.out))
 
 
 def cmd_map(ns: argparse.Namespace) -> None:
-    # mapper internally uses fixed paths, but we let the user override
-    if ns.in_csv:   # monkey-patch globals inside mapper.py
-        mapper.input_file  = str(ns.in_csv)   # type: ignore
-    if ns.out_csv:
-        mapper.output_file = str(ns.out_csv)  # type: ignore
-    mapper()
+    from MapReduce.mapper import mapper
+    mapper(input_csv=ns.in_csv, output_csv=ns.out_csv)
 
 
 def cmd_reduce(ns: argparse.Namespace) -> None:
+    from MapReduce.reducer import reducer
     reducer(
         input_csv_path=ns.in_csv,
         output_csv_path=ns.out_csv,
@@ -110,11 +109,13 @@ def cmd_reduce(ns: argparse.Namespace) -> None:
 
 
 def cmd_pipeline(ns: argparse.Namespace) -> None:
+    from Databases.DbOps import ExportRoutes, produceRoutesCotationsInBulk
+    from MapReduce.mapper import mapper
+    from MapReduce.reducer import reducer
+
     ExportRoutes(str(ns.route_csv))
     if ns.map_step:
-        if ns.mapper_out:
-            mapper.output_file = str(ns.mapper_out)  # type: ignore
-        mapper()
+        mapper(input_csv=ns.route_csv, output_csv=ns.mapper_out)
     if ns.reduce_step:
         reducer(
             input_csv_path=ns.mapper_out,
@@ -130,6 +131,7 @@ def cmd_pipeline(ns: argparse.Namespace) -> None:
 
 
 def cmd_gpt_route(ns: argparse.Namespace) -> None:
+    from AI.AiOps import AiOpsCotationsExtended
     AiOpsCotationsExtended().produceCotationsForRoute(
         route_id=ns.route_id,
         dry_run=ns.dry_run,
@@ -137,6 +139,7 @@ def cmd_gpt_route(ns: argparse.Namespace) -> None:
 
 
 def cmd_gpt_bulk(ns: argparse.Namespace) -> None:
+    from AI.AiOps import AiOpsCotationsExtended
     AiOpsCotationsExtended().produceCotationsInBulk(
         skip=ns.skip,
         limit=ns.limit,
@@ -144,7 +147,18 @@ def cmd_gpt_bulk(ns: argparse.Namespace) -> None:
     )
 
 
+def cmd_gpt_batch(ns: argparse.Namespace) -> None:
+    from AI.AiOps import AiOpsCotationsExtended
+    AiOpsCotationsExtended().produceCotationsBatch(
+        skip=ns.skip,
+        limit=ns.limit,
+        dry_run=ns.dry_run,
+        poll_every=ns.poll_every,
+    )
+
+
 def cmd_csv_route(ns: argparse.Namespace) -> None:
+    from Databases.DbOps import produceRouteCotations
     produceRouteCotations(
         route_id=ns.route_id,
         csv_path=ns.csv,
@@ -153,6 +167,7 @@ def cmd_csv_route(ns: argparse.Namespace) -> None:
 
 
 def cmd_csv_bulk(ns: argparse.Namespace) -> None:
+    from Databases.DbOps import produceRoutesCotationsInBulk
     produceRoutesCotationsInBulk(
         csv_path=ns.csv,
         skip=ns.skip,
@@ -161,6 +176,31 @@ def cmd_csv_bulk(ns: argparse.Namespace) -> None:
     )
 
 
+# -------------------------------------------------------------------
+# maintenance helpers from auxi/ – run in the long-lived container so
+# they share its interpreter and connection pool
+def cmd_count_pending(ns: argparse.Namespace) -> None:
+    from auxi.nbChecker import main as count_pending
+    count_pending(verbose=ns.verbose)
+
+
+def cmd_check_ai_cotations_type(ns: argparse.Namespace) -> None:
+    from auxi.typeChecker import main as check_ai_cotations_type
+    check_ai_cotations_type()
+
+
+def cmd_drop_ai_cotations(ns: argparse.Namespace) -> None:
+    if not ns.yes:
+        sys.exit("drop-ai-cotations is irreversible – re-run with --yes")
+    from auxi.trunc import main as drop_ai_cotations
+    drop_ai_cotations()
+
+
+def cmd_stats(ns: argparse.Namespace) -> None:
+    from auxi.stats import main as stats
+    stats(use_cache=ns.cache)
+
+
 # ===================================================================
 # build the argparse tree
 # -------------------------------------------------------------------
@@ -223,6 +263,18 @@ def build_parser() -> argparse.ArgumentParser:
     _add_bool_flag(sp, "dry_run", False)          # ← 3-arg call now OK
     sp.set_defaults(func=cmd_gpt_bulk)
 
+    # --- gpt-batch -------------------------------------------------
+    sp = sub.add_parser("gpt-batch",
+                        help="GPT many routes through the OpenAI Batch API")
+    _add_bool_flag(sp, "skip", True,
+                   help_on="skip routes with existing ai_cotations",
+                   help_off="process even already-filled routes")
+    sp.add_argument("--limit",   type=int, default=None)
+    sp.add_argument("--poll-every", type=float, default=60.0,
+                    help="seconds between two batch status checks")
+    _add_bool_flag(sp, "dry_run", False)
+    sp.set_defaults(func=cmd_gpt_batch)
+
     # --- csv-route -------------------------------------------------
     sp = sub.add_parser("csv-route", help="import ONE route from a CSV into DB")
     sp.add_argument("route_id", type=int)
@@ -240,6 +292,33 @@ def build_parser() -> argparse.ArgumentParser:
     _add_bool_flag(sp, "dry_run", False)          # ← 3-arg call now OK
     sp.set_defaults(func=cmd_csv_bulk)
 
+    # --- count-pending ---------------------------------------------
+    sp = sub.add_parser("count-pending",
+                        help="count routes that still need GPT cotations")
+    sp.add_argument("--verbose", action="store_true",
+                    help="list the pending route ids")
+    sp.set_defaults(func=cmd_count_pending)
+
+    # --- check-ai-cotations-type -----------------------------------
+    sp = sub.add_parser("check-ai-cotations-type",
+                        help="print the SQL type of route.ai_cotations")
+    sp.set_defaults(func=cmd_check_ai_cotations_type)
+
+    # --- drop-ai-cotations -----------------------------------------
+    sp = sub.add_parser("drop-ai-cotations",
+                        help="IRREVERSIBLY drop the route.ai_cotations column")
+    sp.add_argument("--yes", action="store_true",
+                    help="confirm the drop")
+    sp.set_defaults(func=cmd_drop_ai_cotations)
+
+    # --- stats -----------------------------------------------------
+    sp = sub.add_parser("stats",
+                        help="Mapper / GPT / estimated cost statistics from the DB")
+    sp.add_argument("--cache", action="store_true",
+                    help="reuse the figures while route is unchanged "
+                         "(diskcache, $STATS_CACHE_DIR)")
+    sp.set_defaults(func=cmd_stats)
+
     return p
 
 